@@ -0,0 +1,14 @@
+"""Builds the optional fluid_core extension: python setup.py build_ext --inplace"""
+from setuptools import Extension, setup
+from Cython.Build import cythonize
+
+extensions = [
+    Extension(
+        'fluid_core',
+        ['fluid_core.pyx'],
+        extra_compile_args=['-O3', '-march=native', '-ffast-math', '-fopenmp'],
+        extra_link_args=['-fopenmp'],
+    ),
+]
+
+setup(name='fluid_core', ext_modules=cythonize(extensions))